@@ -16,24 +16,39 @@ from __future__ import annotations
 
 import asyncio
 import base64
+import functools
+import hmac
+import html
 import io
 import mimetypes
-import re
+import os
 import ssl
+import stat
 import textwrap
+import threading
+import time
 import traceback
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
+from tempfile import SpooledTemporaryFile
+from typing import Any, Callable, Optional, TypeVar
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile, ZipInfo
 
 from aiohttp import web
-from bs4 import BeautifulSoup
+import lxml.html
 from lxml import etree
 
 #############################
 # Constants & simple helpers
 #############################
 
+_T = TypeVar("_T")
+
 _CONTAINER_XML = textwrap.dedent("""\
     <?xml version="1.0" encoding="UTF-8"?>
     <container version="1.0"
@@ -44,6 +59,23 @@ _CONTAINER_XML = textwrap.dedent("""\
       </rootfiles>
     </container>""")
 
+_OPF_TEMPLATE = textwrap.dedent("""\
+    <?xml version="1.0" encoding="UTF-8"?>
+    <package version="3.0" xmlns="http://www.idpf.org/2007/opf">
+      <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+        <dc:title>{title}</dc:title>
+        <dc:language>en</dc:language>
+        <dc:identifier>urn:uuid:{title}</dc:identifier>
+      </metadata>
+      <manifest>
+        <item id="content" href="OEBPS/content.xhtml"
+              media-type="application/xhtml+xml"/>{asset_manifest}
+      </manifest>
+      <spine>
+        <itemref idref="content"/>
+      </spine>
+    </package>""")
+
 _HTML_TEMPLATE = textwrap.dedent("""\
     <?xml version="1.0" encoding="UTF-8"?>
     <!DOCTYPE html>
@@ -61,8 +93,132 @@ _HTML_TEMPLATE = textwrap.dedent("""\
     <body></body>
     </html>""")
 
+_XHTML_NS = "http://www.w3.org/1999/xhtml"
+
+_NOISY_TAGS = ("script", "style", "nav", "footer", "iframe")
+
+# Main-content candidates, most specific first; compiled once and reused
+_CONTENT_XPATHS = tuple(
+    etree.XPath(expr, namespaces={"re": "http://exslt.org/regular-expressions"})
+    for expr in (
+        "(//main)[1]",
+        "(//article)[1]",
+        "(//div[re:test(@class, '(?:content|main|article)', 'i')])[1]",
+        "(//body)[1]",
+    )
+)
+
+_REMOTE_PREFIXES = ("data:", "http://", "https://")
+
+_ATTR_ENTITIES = {'"': "&quot;"}
+
+# Suffixes served as EPUB; anything else is sent as a plain file
+_DOCUMENT_SUFFIXES = frozenset({".html", ".htm", ".xhtml"})
+
 _INDEX_CANDIDATES = ("index.xhtml", "index.html", "index.htm")
 
+# In-memory LRU of generated EPUBs
+_EPUB_CACHE_MAX_ENTRIES = 64
+_EPUB_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Referenced asset paths per document, for answering If-None-Match unbuilt
+_EPUB_ASSETS_MAX_ENTRIES = 4096
+# Signature entry of a referenced path that is missing or not a regular file
+_NO_FILE = (-1, -1)
+
+# In-memory LRU of raw asset contents per path, validated by (ino, mtime, size)
+_ASSET_CACHE_MAX_BYTES = 64 * 1024 * 1024
+_ASSET_CACHE_MAX_FILE = 8 * 1024 * 1024
+
+# EPUBs larger than this are spooled to disk and sent in chunks, uncached
+_EPUB_STREAM_THRESHOLD = 2 * 1024 * 1024
+_STREAM_CHUNK_SIZE = 256 * 1024
+
+# Already compressed formats – deflating them again only burns CPU
+_PRECOMPRESSED_MIME = frozenset({
+    "image/jpeg", "image/png", "image/gif", "image/webp", "image/avif",
+    "audio/mpeg", "video/mp4", "application/zip", "font/woff", "font/woff2",
+})
+
+# (referenced asset paths, stat signature of source + assets, ETag, EPUB bytes)
+_StatSignature = tuple[tuple[int, int], ...]
+_EpubCacheEntry = tuple[tuple[Path, ...], _StatSignature, str, bytes]
+# Parsed document plus the stat of the file it was read from / saved as
+_BuiltDocument = tuple[etree._ElementTree, os.stat_result]
+
+def _stat_key(st: os.stat_result) -> tuple[int, int]:
+    """`(mtime_ns, size)` of a regular file, else `_NO_FILE`."""
+    return (st.st_mtime_ns, st.st_size) if stat.S_ISREG(st.st_mode) else _NO_FILE
+
+
+def _stat_signature(paths: tuple[Path, ...]) -> _StatSignature:
+    """Return `_stat_key` for each path (`_NO_FILE` where it is missing)."""
+    signature = []
+    for path in paths:
+        try:
+            signature.append(_stat_key(os.stat(path)))
+        except OSError:
+            signature.append(_NO_FILE)
+    return tuple(signature)
+
+
+@functools.lru_cache(maxsize=256)
+def _build_opf(title: str, assets: tuple[tuple[str, str], ...]) -> str:
+    """Render `_OPF_TEMPLATE` for *title* and `(href, mime)` asset pairs."""
+    asset_manifest = "".join(
+        f'\n    <item id="asset_{i}" href="OEBPS/{escape(href, _ATTR_ENTITIES)}"'
+        f' media-type="{escape(mime, _ATTR_ENTITIES)}"/>'
+        for i, (href, mime) in enumerate(assets)
+    )
+    return _OPF_TEMPLATE.format(title=escape(title), asset_manifest=asset_manifest)
+
+
+def _is_hidden(path: Path, root: str) -> bool:
+    """True if any component of *path* below *root* is a dotfile (e.g. `.auth`)."""
+    return any(part.startswith(".") for part in str(path)[len(root):].split(os.sep))
+
+
+def _etag_for(signature: _StatSignature) -> str:
+    """`"<mtime_ns>-<size>"` of the source, plus a CRC of the asset signatures."""
+    (mtime_ns, size), *assets = signature
+    tag = f"{mtime_ns}-{size}"
+    if assets:
+        tag += f"-{zlib.crc32(repr(assets).encode()):08x}"
+    return f'"{tag}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an `If-None-Match` header against *etag*."""
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
+
+
+def _build_epub_prefix() -> tuple[bytes, tuple[ZipInfo, ...]]:
+    """Pre-zip the `mimetype` and `META-INF/container.xml` entries.
+
+    Returns the raw local entries (to be written at offset 0 of every EPUB)
+    and their `ZipInfo`s for the central directory. A fixed timestamp keeps
+    the bytes reproducible.
+    """
+    buf = io.BytesIO()
+    with ZipFile(buf, "w") as zf:
+        for name, data, compress_type in (
+            ("mimetype", "application/epub+zip", ZIP_STORED),
+            ("META-INF/container.xml", _CONTAINER_XML, ZIP_DEFLATED),
+        ):
+            zinfo = ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+            zinfo.external_attr = 0o600 << 16
+            zf.writestr(zinfo, data, compress_type=compress_type)
+        end_of_entries = buf.tell()
+        infos = tuple(zf.infolist())
+    return buf.getvalue()[:end_of_entries], infos
+
+
+_EPUB_PREFIX, _EPUB_PREFIX_INFOS = _build_epub_prefix()
+
+
 ################
 # Main server
 ################
@@ -76,12 +232,55 @@ class LitepubServer:
     key_path: str = "tests/example-keys/server.key"
     content_dir: Path | str = "tests/example-content"
     app: web.Application = field(init=False)
+    _epub_cache: OrderedDict[Path, _EpubCacheEntry] = field(init=False, repr=False)
+    _epub_cache_bytes: int = field(init=False, repr=False)
+    _epub_assets: OrderedDict[Path, tuple[Path, ...]] = field(init=False, repr=False)
+    _asset_cache: OrderedDict[str, tuple[tuple[int, int, int], bytes]] = field(
+        init=False, repr=False
+    )
+    _asset_cache_bytes: int = field(init=False, repr=False)
+    _asset_lock: threading.Lock = field(init=False, repr=False)
+    _auth_cache: dict[Path, tuple[int, Optional[bytes]]] = field(init=False, repr=False)
+    _content_dir_str: str = field(init=False, repr=False)
+    _cpu_pool: ThreadPoolExecutor = field(init=False, repr=False)
+    _cpu_slots: asyncio.Semaphore = field(init=False, repr=False)
 
     def __post_init__(self) -> None:
         self.content_dir = Path(self.content_dir).resolve()
         self.content_dir.mkdir(exist_ok=True, parents=True)
+        self._content_dir_str = os.path.join(str(self.content_dir), "")
+        self._epub_cache = OrderedDict()
+        self._epub_cache_bytes = 0
+        self._epub_assets = OrderedDict()
+        self._asset_cache = OrderedDict()
+        self._asset_cache_bytes = 0
+        self._asset_lock = threading.Lock()
+        self._auth_cache = {}
+        # Dedicated pool for lxml/zlib work (both release the GIL), kept
+        # apart from the default executor aiohttp uses for DNS etc.
+        workers = os.cpu_count() or 4
+        self._cpu_pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="litepub-cpu"
+        )
+        # Caps queued + running CPU jobs; only `_run_cpu` takes a slot
+        self._cpu_slots = asyncio.Semaphore(workers * 2)
         self.app = web.Application()
         self.app.router.add_get("/{path:.*}", self.handle_request)
+        self.app.on_cleanup.append(self._shutdown_cpu_pool)
+
+    async def _run_cpu(self, func: Callable[..., _T], *args: Any) -> _T:
+        """Run *func* on the CPU pool, bounding how much work may queue up.
+
+        Only for CPU-bound work (parsing, zipping): *func* must never wait on
+        a client connection, since the slot and the worker stay taken until
+        it returns. Network I/O happens on the event loop afterwards.
+        """
+        async with self._cpu_slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._cpu_pool, func, *args)
+
+    async def _shutdown_cpu_pool(self, app: web.Application) -> None:
+        self._cpu_pool.shutdown(wait=False, cancel_futures=True)
 
     # --------------------------------------------------------------------- #
     # Request handling
@@ -92,7 +291,7 @@ class LitepubServer:
         raw_path: str = request.match_info["path"]
         safe_path = self._resolve_path(raw_path)
 
-        if safe_path is None:
+        if safe_path is None or _is_hidden(safe_path, self._content_dir_str):
             return web.Response(status=404, text="Not Found")
 
         # Directory – serve listing or implicit index file
@@ -103,6 +302,8 @@ class LitepubServer:
                     safe_path = candidate
                     break
             else:
+                if self._real_path(safe_path) is None:
+                    return web.Response(status=404, text="Not Found")
                 return await self._render_directory(safe_path, raw_path)
 
         # *.epub alias – map to underlying xhtml/html
@@ -111,25 +312,67 @@ class LitepubServer:
 
         if not safe_path.exists() or safe_path.is_dir():
             return web.Response(status=404, text="Not Found")
+        real_path = self._real_path(safe_path)
+        if real_path is None:
+            return web.Response(status=404, text="Not Found")
 
-        # Optional Basic-Auth
-        auth_resp = await self._check_basic_auth(safe_path, request)
+        # Optional Basic-Auth – `.auth` guards the directory the file really
+        # lives in, so a symlink elsewhere cannot bypass it
+        auth_resp = await self._check_basic_auth(real_path, request)
         if auth_resp:
             return auth_resp
 
+        # Images, stylesheets, … – hand the file over as-is (sendfile, ETag,
+        # conditional & range requests are all handled by aiohttp)
+        if safe_path.suffix.lower() not in _DOCUMENT_SUFFIXES:
+            return web.FileResponse(safe_path)
+
+        response = web.StreamResponse(headers={"Content-Type": "application/epub+zip"})
         try:
+            built: Optional[_BuiltDocument] = None
             if safe_path.suffix.lower() in {".html", ".htm"}:
-                safe_path = await self._html_to_xhtml(safe_path)
+                safe_path, built = await self._html_to_xhtml(safe_path)
+                real_xhtml = self._real_path(safe_path)  # may be a symlink
+                if real_xhtml is None:
+                    return web.Response(status=404, text="Not Found")
+                if real_xhtml.parent != real_path.parent:
+                    auth_resp = await self._check_basic_auth(real_xhtml, request)
+                    if auth_resp:
+                        return auth_resp
+
+            if_none_match = request.headers.get("If-None-Match", "")
+            cached = self._cached_epub(safe_path)
+            if cached is None:
+                # Client copy still current (per the stat signature) – no build
+                etag = self._current_etag(safe_path) if if_none_match else None
+                if etag is not None and _etag_matches(if_none_match, etag):
+                    return web.Response(status=304, headers={"ETag": etag})
+
+                epub, watched, signature = await self._xhtml_to_epub(safe_path, built)
+                if not isinstance(epub, bytes):  # large EPUB spooled to disk
+                    etag = self._cache_epub(safe_path, watched, signature)
+                    if _etag_matches(if_none_match, etag):
+                        epub.close()
+                        return web.Response(status=304, headers={"ETag": etag})
+                    response.headers["ETag"] = etag
+                    return await self._send_spooled(request, response, epub)
+                epub_bytes = epub
+                etag = self._cache_epub(safe_path, watched, signature, epub_bytes)
+            else:
+                etag, epub_bytes = cached
 
-            epub_bytes = await self._xhtml_to_epub(safe_path)
-            return web.Response(
-                body=epub_bytes,
-                headers={
-                    "Content-Type": "application/epub+zip",
-                    "Content-Length": str(len(epub_bytes)),
-                },
-            )
+            if _etag_matches(if_none_match, etag):
+                return web.Response(status=304, headers={"ETag": etag})
+
+            headers = {
+                "Content-Type": "application/epub+zip",
+                "Content-Length": str(len(epub_bytes)),
+                "ETag": etag,
+            }
+            return web.Response(body=epub_bytes, headers=headers)
         except Exception as exc:  # pragma: no cover
+            if response.prepared:
+                raise  # headers already sent; let aiohttp drop the connection
             traceback.print_exc()
             return web.Response(status=500, text=f"Internal Server Error: {exc}")
 
@@ -142,27 +385,34 @@ class LitepubServer:
     ) -> Optional[web.Response]:
         """Validate Basic‐Auth credentials if `.auth` file is present.
 
-        `.auth` must contain `user:password` on a single line.
+        `.auth` must contain `user:password` on a single line. The expected
+        header token is cached per file and refreshed when its mtime changes.
         """
         auth_file = file_path.parent / ".auth"
-        if not auth_file.exists():
+        try:
+            mtime_ns = auth_file.stat().st_mtime_ns
+        except FileNotFoundError:
             return None
 
+        cached = self._auth_cache.get(auth_file)
+        if cached is None or cached[0] != mtime_ns:
+            try:
+                user_pass = (await asyncio.to_thread(auth_file.read_text)).strip()
+            except (OSError, UnicodeDecodeError):
+                user_pass = ""  # unreadable – deny everyone
+            # Clients send base64("user:password"); compare in that form
+            token = base64.b64encode(user_pass.encode()) if ":" in user_pass else None
+            self._auth_cache[auth_file] = cached = (mtime_ns, token)
+
+        token = cached[1]
         auth_header = request.headers.get("Authorization", "")
-        if not auth_header.startswith("Basic "):
-            return web.Response(
-                status=401,
-                headers={"WWW-Authenticate": 'Basic realm="Litepub"'},
-                text="Unauthorized",
+        if (
+            token is None
+            or not auth_header.startswith("Basic ")
+            or not hmac.compare_digest(
+                auth_header[6:].strip().encode("ascii", "replace"), token
             )
-
-        try:
-            decoded = base64.b64decode(auth_header[6:]).decode()
-            username, password = decoded.split(":", 1)
-            stored_user, stored_pass = auth_file.read_text().strip().split(":", 1)
-            if (username, password) != (stored_user, stored_pass):
-                raise ValueError("Bad credentials")
-        except Exception:
+        ):
             return web.Response(
                 status=401,
                 headers={"WWW-Authenticate": 'Basic realm="Litepub"'},
@@ -176,33 +426,43 @@ class LitepubServer:
 
     async def _render_directory(self, dir_path: Path, req_path: str) -> web.Response:
         """Return a simple HTML listing of a directory."""
+        # DirEntry caches the file type from readdir – no stat per entry
+        with os.scandir(dir_path) as it:
+            entries = sorted(
+                (e for e in it if not e.name.startswith(".")), key=lambda e: e.name
+            )
+
+        prefix = f"{req_path.rstrip('/')}/" if req_path else ""
         links: list[str] = []
-        for entry in sorted(p for p in dir_path.iterdir() if not p.name.startswith(".")):
-            name = f"{entry.name}{'/' if entry.is_dir() else ''}"
-            href = f"{req_path.rstrip('/')}/{entry.name}" if req_path else entry.name
+        for entry in entries:
+            href = html.escape(quote(prefix + entry.name))
             if entry.is_dir():
-                links.append(f'<li><a href="/{href}">{name}</a></li>')
-            else:
+                links.append(f'<li><a href="/{href}">{html.escape(entry.name)}/</a></li>')
+            elif os.path.splitext(entry.name)[1].lower() in _DOCUMENT_SUFFIXES:
                 epub_href = f"{href.rsplit('.', 1)[0]}.epub"
                 links.append(
-                    f'<li><a href="/{href}">{name}</a> '
+                    f'<li><a href="/{href}">{html.escape(entry.name)}</a> '
                     f'(<a href="/{epub_href}">epub</a>)</li>'
                 )
+            else:
+                links.append(f'<li><a href="/{href}">{html.escape(entry.name)}</a></li>')
 
         parent_link = ""
         if req_path:
             parent = str(Path(req_path).parent)
-            parent_link = f'<li><a href="/{"" if parent == "." else parent}">..</a></li>'
+            parent_href = html.escape(quote("" if parent == "." else parent))
+            parent_link = f'<li><a href="/{parent_href}">..</a></li>'
 
+        title = html.escape(req_path)
         html_page = f"""<!DOCTYPE html>
 <html><head><meta charset="utf-8">
-<title>Directory listing for {req_path}</title>
+<title>Directory listing for {title}</title>
 <style>
 body{{font-family:system-ui,-apple-system,sans-serif;margin:2em}}
 ul{{list-style:none;padding:0}}li{{margin:.5em 0}}
 a{{text-decoration:none;color:#0366d6}}a:hover{{text-decoration:underline}}
 </style></head><body>
-<h1>Directory listing for /{req_path}</h1>
+<h1>Directory listing for /{title}</h1>
 <ul>{parent_link}{''.join(links)}</ul></body></html>"""
 
         return web.Response(text=html_page, content_type="text/html")
@@ -212,68 +472,213 @@ a{{text-decoration:none;color:#0366d6}}a:hover{{text-decoration:underline}}
     # ------------------------------------------------------------------ #
 
     def _resolve_path(self, raw: str) -> Optional[Path]:
-        """Return absolute path inside `content_dir`, else *None* (404)."""
-        try:
-            target = (self.content_dir / raw).resolve()
-        except (FileNotFoundError, RuntimeError):
+        """Return absolute path inside `content_dir`, else *None* (404).
+
+        Pure string normalisation (no filesystem walk); symlinks are checked
+        with `_real_path` once the file that will be served is known.
+        """
+        root = self._content_dir_str
+        target = os.path.normpath(os.path.join(root, raw))
+        # Disallow `..` breakout (normpath has already collapsed it)
+        if not target.startswith(root) and target != root[:-1]:
             return None
-        # Disallow `..` breakout
-        if self.content_dir not in target.parents and target != self.content_dir:
+        return Path(target)
+
+    def _real_path(self, path: Path) -> Optional[Path]:
+        """Return *path* with symlinks followed, or *None* if that leaves
+        `content_dir` or lands on a dotfile (404)."""
+        real = os.path.realpath(path)
+        root = self._content_dir_str
+        if real == root[:-1]:
+            return Path(real)
+        if not real.startswith(root) or _is_hidden(Path(real), root):
             return None
-        return target
+        return Path(real)
 
     # ------------------------------------------------------------------ #
     #  HTML ➜ cleaned XHTML
     # ------------------------------------------------------------------ #
 
-    async def _html_to_xhtml(self, html_path: Path) -> Path:
-        """Strip ads/scripts and save as adjacent `.xhtml` file (idempotent)."""
+    async def _html_to_xhtml(
+        self, html_path: Path
+    ) -> tuple[Path, Optional[_BuiltDocument]]:
+        """Strip ads/scripts and save as adjacent `.xhtml` file (idempotent).
+
+        Returns the `.xhtml` path plus the freshly built tree and the stat of
+        the saved file, so callers can skip re-parsing it; *None* when the
+        file was up-to-date.
+        The work runs on the CPU pool to keep the event loop responsive.
+        """
+        return await self._run_cpu(self._html_to_xhtml_sync, html_path)
+
+    def _html_to_xhtml_sync(
+        self, html_path: Path
+    ) -> tuple[Path, Optional[_BuiltDocument]]:
+        """Blocking body of `_html_to_xhtml`."""
         xhtml_path = html_path.with_suffix(".xhtml")
         if xhtml_path.exists() and xhtml_path.stat().st_mtime >= html_path.stat().st_mtime:
-            return xhtml_path  # already up-to-date
+            return xhtml_path, None  # already up-to-date
 
-        soup = BeautifulSoup(html_path.read_text("utf-8"), "html.parser")
+        parser = lxml.html.HTMLParser(encoding="utf-8")
+        try:
+            doc = lxml.html.document_fromstring(html_path.read_bytes(), parser=parser)
+        except etree.ParserError:
+            doc = None  # empty/whitespace-only file – emit the bare template
+
+        content = title = None
+        if doc is not None:
+            # Drop noisy elements (keeping any trailing text)
+            etree.strip_elements(doc, *_NOISY_TAGS, with_tail=False)
+
+            for find_content in _CONTENT_XPATHS:
+                if (found := find_content(doc)):
+                    content = found[0]
+                    break
+            title = doc.findtext(".//title")
 
-        # Drop noisy elements
-        for tag in soup(["script", "style", "nav", "footer", "iframe"]):
-            tag.decompose()
+        # New clean document
+        new = etree.fromstring(_HTML_TEMPLATE.encode("utf-8"))
+        if title is not None:
+            new.find(f".//{{{_XHTML_NS}}}title").text = title
+
+        if content is not None:
+            # Ensure image links are left intact for later EPUB embedding;
+            # text after the element belongs to the discarded page chrome
+            content.tail = None
+            new.find(f"{{{_XHTML_NS}}}body").append(content)
+
+        tree = new.getroottree()
+        # Write-then-rename so concurrent readers never see a partial file
+        tmp_path = xhtml_path.with_name(f".{xhtml_path.name}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(etree.tostring(tree, encoding="utf-8", xml_declaration=True))
+        st = tmp_path.stat()  # rename keeps it; a later rewrite will not match
+        os.replace(tmp_path, xhtml_path)
+        return xhtml_path, (tree, st)
 
-        content = (
-            soup.find("main")
-            or soup.find("article")
-            or soup.find("div", class_=re.compile(r"(?:content|main|article)", re.I))
-            or soup.body
-        )
+    # ------------------------------------------------------------------ #
+    #  EPUB cache
+    # ------------------------------------------------------------------ #
 
-        # New clean document
-        new = BeautifulSoup(_HTML_TEMPLATE, "xml")
-        if (title := soup.title):
-            new.title.string = title.string
+    def _cached_epub(self, xhtml_file: Path) -> Optional[tuple[str, bytes]]:
+        """Return `(etag, epub_bytes)` if neither source nor assets changed."""
+        entry = self._epub_cache.get(xhtml_file)
+        if entry is None:
+            return None
+
+        assets, signature, etag, epub_bytes = entry
+        if _stat_signature((xhtml_file, *assets)) != signature:
+            self._drop_cached_epub(xhtml_file)
+            return None
+
+        self._epub_cache.move_to_end(xhtml_file)
+        return etag, epub_bytes
 
-        if content:
-            # Ensure image links are left intact for later EPUB embedding
-            new.body.append(content)
+    def _current_etag(self, xhtml_file: Path) -> Optional[str]:
+        """ETag of the EPUB a build would produce now, if already known.
 
-        xhtml_path.write_text(str(new), encoding="utf-8")
-        return xhtml_path
+        Uses the asset list recorded at the last build; any edit to the
+        source changes its own stat, so a stale list can never match.
+        """
+        if (assets := self._epub_assets.get(xhtml_file)) is None:
+            return None
+        signature = _stat_signature((xhtml_file, *assets))
+        return None if signature[0] == _NO_FILE else _etag_for(signature)
+
+    def _cache_epub(
+        self,
+        xhtml_file: Path,
+        assets: tuple[Path, ...],
+        signature: _StatSignature,
+        epub_bytes: Optional[bytes] = None,
+    ) -> str:
+        """Record a fresh build and return its ETag.
+
+        *signature* must have been taken before the files were read, so a
+        change made during the build invalidates the entry. The asset list
+        is always remembered for `_current_etag`; the bytes are cached only
+        when given and within budget.
+        """
+        self._epub_assets[xhtml_file] = assets
+        self._epub_assets.move_to_end(xhtml_file)
+        if len(self._epub_assets) > _EPUB_ASSETS_MAX_ENTRIES:
+            self._epub_assets.popitem(last=False)
+
+        etag = _etag_for(signature)
+        if epub_bytes is None or len(epub_bytes) > _EPUB_CACHE_MAX_BYTES:
+            return etag
+
+        self._drop_cached_epub(xhtml_file)
+        self._epub_cache[xhtml_file] = (assets, signature, etag, epub_bytes)
+        self._epub_cache_bytes += len(epub_bytes)
+
+        # Evict least recently used entries until we are back within budget
+        while (
+            len(self._epub_cache) > _EPUB_CACHE_MAX_ENTRIES
+            or self._epub_cache_bytes > _EPUB_CACHE_MAX_BYTES
+        ):
+            _, (*_, evicted) = self._epub_cache.popitem(last=False)
+            self._epub_cache_bytes -= len(evicted)
+        return etag
+
+    def _drop_cached_epub(self, xhtml_file: Path) -> None:
+        if (entry := self._epub_cache.pop(xhtml_file, None)) is not None:
+            self._epub_cache_bytes -= len(entry[3])
 
     # ------------------------------------------------------------------ #
     #  XHTML ➜ EPUB
     # ------------------------------------------------------------------ #
 
-    async def _xhtml_to_epub(self, xhtml_file: Path) -> bytes:
-        parser = etree.HTMLParser()
-        tree = etree.parse(str(xhtml_file), parser)
+    async def _xhtml_to_epub(
+        self, xhtml_file: Path, built: Optional[_BuiltDocument] = None
+    ) -> tuple[bytes | SpooledTemporaryFile, tuple[Path, ...], _StatSignature]:
+        """Build the EPUB; returns it, the paths it depends on (embedded
+        assets, then unresolved references) and their stat signature.
 
-        from zipfile import ZipFile, ZIP_DEFLATED, ZIP_STORED
+        *built* is the already parsed document, if the caller has one in hand.
+        EPUBs up to `_EPUB_STREAM_THRESHOLD` come back as bytes; larger ones
+        as a rewound temporary file for `_send_spooled`, so they are never
+        held in memory whole. Parsing and zipping run on the CPU pool.
+        """
+        return await self._run_cpu(self._xhtml_to_epub_sync, xhtml_file, built)
+
+    def _xhtml_to_epub_sync(
+        self, xhtml_file: Path, built: Optional[_BuiltDocument]
+    ) -> tuple[bytes | SpooledTemporaryFile, tuple[Path, ...], _StatSignature]:
+        """Blocking body of `_xhtml_to_epub`."""
+        # Every file is stat'ed before it is read, so an edit racing the
+        # build leaves a stale signature rather than a stale "fresh" entry
+        if built is not None:
+            tree, source_st = built
+        else:
+            source_st = os.stat(xhtml_file)
+            parser = etree.XMLParser(
+                collect_ids=False, resolve_entities=False, no_network=True, huge_tree=True
+            )
+            try:
+                tree = etree.parse(str(xhtml_file), parser)
+            except etree.XMLSyntaxError:
+                # Hand-written .xhtml is not always well-formed; recover leniently
+                tree = etree.parse(str(xhtml_file), etree.HTMLParser())
+
+        assets, unresolved = self._collect_assets(tree, base=xhtml_file.parent)
+        watched = (*(Path(path) for path, _ in assets.values()), *unresolved)
+        signature = (
+            _stat_key(source_st),
+            *(_stat_key(st) for _, st in assets.values()),
+            *(_NO_FILE for _ in unresolved),
+        )
 
-        buf = io.BytesIO()
-        with ZipFile(buf, "w", ZIP_DEFLATED) as epub:
-            epub.writestr("mimetype", "application/epub+zip", ZIP_STORED)
-            epub.writestr("META-INF/container.xml", _CONTAINER_XML)
+        # Stays in memory up to the threshold, then rolls over to disk
+        out = SpooledTemporaryFile(max_size=_EPUB_STREAM_THRESHOLD)
+        # mimetype + container.xml are identical for every EPUB: copy the
+        # prebuilt entries and register them so they land in the directory
+        out.write(_EPUB_PREFIX)
+        with ZipFile(out, "w", ZIP_DEFLATED, compresslevel=1) as epub:
+            epub.filelist.extend(_EPUB_PREFIX_INFOS)
+            epub.NameToInfo.update((zi.filename, zi) for zi in _EPUB_PREFIX_INFOS)
 
-            # Collect and embed local assets
-            embedded_assets = await self._embed_assets(epub, tree, base=xhtml_file.parent)
+            # Embed local assets
+            embedded_assets = self._embed_assets(epub, assets)
 
             # Main document
             epub.writestr("OEBPS/content.xhtml",
@@ -283,71 +688,132 @@ a{{text-decoration:none;color:#0366d6}}a:hover{{text-decoration:underline}}
             epub.writestr("content.opf",
                           self._create_content_opf(xhtml_file.stem, embedded_assets))
 
-        return buf.getvalue()
+        if out.tell() > _EPUB_STREAM_THRESHOLD:
+            out.seek(0)
+            return out, watched, signature
+        with out:
+            out.seek(0)
+            return out.read(), watched, signature
+
+    async def _send_spooled(
+        self,
+        request: web.Request,
+        response: web.StreamResponse,
+        spooled: SpooledTemporaryFile,
+    ) -> web.StreamResponse:
+        """Send a large spooled EPUB in chunks, then discard the temp file.
+
+        Runs on the event loop (reads go through the default executor), so
+        a slow client never holds a CPU-pool worker.
+        """
+        with spooled:
+            response.content_length = spooled.seek(0, os.SEEK_END)
+            spooled.seek(0)
+            await response.prepare(request)
+            while chunk := await asyncio.to_thread(spooled.read, _STREAM_CHUNK_SIZE):
+                await response.write(chunk)
+        await response.write_eof()
+        return response
+
+    def _collect_assets(
+        self, tree: etree._ElementTree, base: Path
+    ) -> tuple[dict[str, tuple[str, os.stat_result]], tuple[Path, ...]]:
+        """Find local files referenced via @src inside `content_dir`.
+
+        Returns `{src: (real_path, stat_result)}` in document order, plus
+        the paths of references that are not (yet) a regular file, so the
+        EPUB cache can notice when one appears.
+        """
+        assets: dict[str, tuple[str, os.stat_result]] = {}
+        unresolved: dict[str, Path] = {}
+        root = self._content_dir_str
+        base_dir = str(base)
+
+        # Single pass over elements – cheaper than materialising an XPath list
+        for el in tree.iter(etree.Element):
+            src = el.get("src")
+            if (
+                src is None
+                or src in assets
+                or src in unresolved
+                or src.startswith(_REMOTE_PREFIXES)
+            ):
+                continue  # no reference, duplicate, or remote/data URI
+
+            ref_path = os.path.join(base_dir, src)
+            asset_path = os.path.realpath(ref_path)
+            if not asset_path.startswith(root):
+                continue
 
-    async def _embed_assets(
-        self, epub: "ZipFile", tree: etree._ElementTree, base: Path
+            try:
+                st = os.stat(asset_path)
+            except OSError:
+                st = None
+            if st is not None and stat.S_ISREG(st.st_mode):
+                assets[src] = (asset_path, st)
+            else:
+                unresolved[src] = Path(os.path.normpath(ref_path))
+
+        return assets, tuple(unresolved.values())
+
+    def _embed_assets(
+        self, epub: ZipFile, assets: dict[str, tuple[str, os.stat_result]]
     ) -> dict[str, str]:
-        """Embed images referenced by relative paths and rewrite @src.
-        
+        """Embed collected assets under `OEBPS/` (paths stay relative).
+
         Returns a dictionary mapping asset paths to their MIME types for manifest generation.
         """
-        added: set[str] = set()
         manifest_assets: dict[str, str] = {}
+        writestr = epub.writestr
 
-        for el in tree.xpath("//*[@src]"):
-            src = el.attrib["src"]
-            if src.startswith(("data:", "http://", "https://")):
-                continue  # skip remote/data URIs
+        for src, (asset_path, st) in assets.items():
+            data = self._read_asset(asset_path, st)
+            mime = mimetypes.guess_type(asset_path)[0] or "application/octet-stream"
+            compress_type = ZIP_STORED if mime in _PRECOMPRESSED_MIME else ZIP_DEFLATED
+            zinfo = ZipInfo(f"OEBPS/{src}", date_time=time.localtime()[:6])
+            zinfo.external_attr = 0o600 << 16  # as writestr() does for names
+            writestr(zinfo, data, compress_type=compress_type)
+            manifest_assets[src] = mime
 
-            asset_path = (base / src).resolve()
-            if not asset_path.exists() or self.content_dir not in asset_path.parents:
-                continue
+        return manifest_assets
 
-            mime = mimetypes.guess_type(asset_path.name)[0] or "application/octet-stream"
-            epub_dest = f"OEBPS/{src}"
-            if epub_dest not in added:
-                epub.writestr(epub_dest, asset_path.read_bytes())
-                added.add(epub_dest)
-                manifest_assets[src] = mime
+    def _read_asset(self, asset_path: str, st: os.stat_result) -> bytes:
+        """Return the asset's contents, served from memory while unchanged.
 
-            el.attrib["src"] = src  # keep path relative inside EPUB
-        
-        return manifest_assets
+        Entries are keyed on the path and replaced as soon as the file's
+        (st_ino, st_mtime_ns, st_size) changes; files above
+        `_ASSET_CACHE_MAX_FILE` are read every time and never cached.
+        """
+        signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+        with self._asset_lock:
+            if (entry := self._asset_cache.get(asset_path)) is not None:
+                if entry[0] == signature:
+                    self._asset_cache.move_to_end(asset_path)
+                    return entry[1]
+                del self._asset_cache[asset_path]  # stale
+                self._asset_cache_bytes -= len(entry[1])
+
+        with open(asset_path, "rb") as fh:
+            data = fh.read()
+
+        if len(data) > _ASSET_CACHE_MAX_FILE:
+            return data
+
+        with self._asset_lock:  # called from worker threads
+            if (old := self._asset_cache.pop(asset_path, None)) is not None:
+                self._asset_cache_bytes -= len(old[1])
+            self._asset_cache[asset_path] = (signature, data)
+            self._asset_cache_bytes += len(data)
+            while self._asset_cache_bytes > _ASSET_CACHE_MAX_BYTES:
+                _, (_, evicted) = self._asset_cache.popitem(last=False)
+                self._asset_cache_bytes -= len(evicted)
+        return data
 
     # --------------------------- OPF helper --------------------------- #
 
     def _create_content_opf(self, title: str, assets: dict[str, str] = None) -> str:
         """Create OPF manifest file including all embedded assets."""
-        if assets is None:
-            assets = {}
-            
-        # Build manifest items for embedded assets
-        asset_items = []
-        for i, (asset_path, mime_type) in enumerate(assets.items()):
-            asset_id = f"asset_{i}"
-            asset_items.append(f'    <item id="{asset_id}" href="OEBPS/{asset_path}" media-type="{mime_type}"/>')
-        
-        asset_manifest = '\n'.join(asset_items)
-        if asset_manifest:
-            asset_manifest = '\n' + asset_manifest
-            
-        return textwrap.dedent(f"""\
-            <?xml version="1.0" encoding="UTF-8"?>
-            <package version="3.0" xmlns="http://www.idpf.org/2007/opf">
-              <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
-                <dc:title>{title}</dc:title>
-                <dc:language>en</dc:language>
-                <dc:identifier>urn:uuid:{title}</dc:identifier>
-              </metadata>
-              <manifest>
-                <item id="content" href="OEBPS/content.xhtml"
-                      media-type="application/xhtml+xml"/>{asset_manifest}
-              </manifest>
-              <spine>
-                <itemref idref="content"/>
-              </spine>
-            </package>""")
+        return _build_opf(title, tuple(assets.items()) if assets else ())
 
     # ------------------------------------------------------------------ #
     #  Server bootstrap